@@ -1,6 +1,7 @@
 
 from typing import Tuple, List
 import importlib, traceback
+import model_manager
 
 def _import(name):
     try:
@@ -21,29 +22,35 @@ class UnifiedAgent:
         print("C Hybrid:", bool(mod_c))
         print("D Router:", bool(mod_d))
         print("E MultiQuery:", bool(mod_e))
+        # preload embed + chat models and keep them resident
+        model_manager.start()
 
-    def answer_conditional(self, q):
-        return mod_b.answer_question_conditional(q)
+    def metrics(self):
+        return model_manager.metrics()
 
-    def answer_hybrid(self, q):
-        return mod_c.answer_hybrid(q)
+    def answer_conditional(self, q, filters=None):
+        return mod_b.answer_question_conditional(q, filters=filters)
 
-    def answer_router(self, q):
-        return mod_d.answer_router(q)
+    def answer_hybrid(self, q, filters=None):
+        return mod_c.answer_hybrid(q, filters=filters)
 
-    def answer_multiquery(self, q):
-        return mod_e.answer_multi(q)
+    def answer_router(self, q, filters=None):
+        return mod_d.answer_router(q, filters=filters)
 
-    def run_mode(self, mode, q):
+    def answer_multiquery(self, q, filters=None):
+        return mod_e.answer_multi(q, filters=filters)
+
+    def run_mode(self, mode, q, filters=None):
+        """`filters` is a metadata filter expression (see filters.build_filter) applied in Qdrant."""
         mode = mode.lower()
         if mode=="conditional":
-            ans,src = self.answer_conditional(q)
+            ans,src = self.answer_conditional(q, filters)
         elif mode=="hybrid":
-            ans,src = self.answer_hybrid(q)
+            ans,src = self.answer_hybrid(q, filters)
         elif mode=="router":
-            ans,src = self.answer_router(q)
+            ans,src = self.answer_router(q, filters)
         elif mode=="multi":
-            ans,src = self.answer_multiquery(q)
+            ans,src = self.answer_multiquery(q, filters)
         else:
             raise ValueError("Unknown mode")
         return {"mode":mode,"question":q,"answer":ans,"sources":src}
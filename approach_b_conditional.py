@@ -19,9 +19,9 @@ def needs_rag(question:str)->bool:
     resp=call_llm(prompt).strip().upper()
     return "RAG_REQUIRED" in resp
 
-def answer_question_conditional(q):
+def answer_question_conditional(q,filters=None):
     if needs_rag(q):
-        pts=retrieve_context(q)
+        pts=retrieve_context(q,filters=filters)
         prompt=build_prompt(q,pts)
         ans=call_llm(prompt)
         return ans, pts
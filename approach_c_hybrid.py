@@ -1,19 +1,22 @@
 
 from rag import retrieve_context, build_prompt, call_llm, qdrant, COLLECTION_NAME
+from filters import build_filter
+from shards import scroll_shards, shards_for_filter
 """Hybrid retrieval improves recall by combining:
 
 Vector search
 
 Keyword/BM25 search
 
-Metadata filtering (filename, category, tags)"""
-def keyword_search(q,limit=5):
+Metadata filtering (filename, category, tags), pushed down to Qdrant
+so both searches only see the filtered subset."""
+def keyword_search(q,limit=5,filters=None):
     """
     Basic keyword search scanning Qdrant payloads.
     (Not high-performance but works for demo.)
     """
     print(qdrant)
-    pts,_ = qdrant.scroll(collection_name=COLLECTION_NAME,limit=500,with_payload=True)
+    pts = scroll_shards(500,scroll_filter=build_filter(filters),shards=shards_for_filter(filters))
     print("1")
     words=set(q.lower().split())
     print("2")
@@ -26,17 +29,17 @@ def keyword_search(q,limit=5):
     print("3")
     return [p for _,p in scored[:limit]]
 
-def hybrid_retrieve(q,limit=5):
+def hybrid_retrieve(q,limit=5,filters=None):
     print("1")
-    v=retrieve_context(q,limit)
+    v=retrieve_context(q,limit,filters=filters)
     print("2")
-    k=keyword_search(q,limit)
+    k=keyword_search(q,limit,filters=filters)
     merged={p.id:p for p in v}
     for p in k: merged[p.id]=p
     return list(merged.values())[:limit]
 
-def answer_hybrid(q):
+def answer_hybrid(q,filters=None):
     print("1.1")
-    pts=hybrid_retrieve(q)
+    pts=hybrid_retrieve(q,filters=filters)
     prompt=build_prompt(q,pts)
     return call_llm(prompt), pts
@@ -18,22 +18,20 @@ Question: {q}
     r=call_llm(prompt).strip().upper()
     return r if r in ["RAG", "SQL", "API", "DIRECT"] else "RAG"
 
-def answer_router(question):
+def answer_router(question,filters=None):
     tool=route_query(question)
     print(f"Router selected: {tool}")
 
     if tool == "DIRECT":
         return {"answer": call_llm(question), "sources": []}
 
-    if tool == "RAG":
-        return build_prompt(question)
-
     if tool == "SQL":
         return {"answer": sql_tool(question), "sources": []}
 
     if tool == "API":
         return {"answer": api_tool(question), "sources": []}
-    pts=retrieve_context(question)
+    # RAG: retrieve (restricted by filters) and answer from the context
+    pts=retrieve_context(question,filters=filters)
     prompt=build_prompt(question,pts)
     return call_llm(prompt), pts
 
@@ -45,16 +45,16 @@ def expand_query(q):
     try: return eval(r)
     except: return [q]
 
-def multi_query_retrieve(q,top_k=5):
+def multi_query_retrieve(q,top_k=5,filters=None):
     qs=expand_query(q)
     print("Expanded queries:", qs)
     merged={}
     for sub in qs:
-        pts=retrieve_context(sub,top_k)
+        pts=retrieve_context(sub,top_k,filters=filters)
         for p in pts: merged[p.id]=p
     return list(merged.values())[:top_k]
 
-def answer_multi(q):
-    pts=multi_query_retrieve(q)
+def answer_multi(q,filters=None):
+    pts=multi_query_retrieve(q,filters=filters)
     prompt=build_prompt(q,pts)
     return call_llm(prompt), pts
@@ -0,0 +1,28 @@
+"""
+Shared settings for the Qdrant and Ollama helpers (shards.py, model_manager.py, dedup.py).
+.env is loaded once here, so importers don't depend on calling load_dotenv() first.
+"""
+import os, re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Qdrant ---
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "my_docs")
+QDRANT_SHARDS = os.getenv("QDRANT_SHARDS")
+SHARD_KEY = os.getenv("QDRANT_SHARD_KEY", "doc_id")
+SHARD_TIMEOUT = float(os.getenv("QDRANT_SHARD_TIMEOUT", "10"))
+
+# --- Ollama ---
+OLLAMA_BASE_URL = re.sub(r"/api/.*$", "", os.getenv("OLLAMA_URL", "http://localhost:11434"))
+# single embedding-model setting for ingest and queries (OLLAMA_MODEL is the older name ingest used)
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL") or os.getenv("OLLAMA_MODEL", "nomic-embed-text")
+LLM_MODEL = os.getenv("OLLAMA_LLM_MODEL", "llama3")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+WARMUP_INTERVAL = float(os.getenv("OLLAMA_WARMUP_INTERVAL", "240"))
+COLD_LOAD_MS = float(os.getenv("OLLAMA_COLD_LOAD_MS", "100"))
+
+# --- Dedup ---
+DEDUP_INDEX = os.getenv("DEDUP_INDEX", "dedup_index.json")
@@ -5,11 +5,19 @@ Load documents from a directory. Supports:
  - Plain text (.txt)
 
 Returns a list of dicts: {"id": "<path-based-id>", "text": "...", "meta": {...}}
+
+meta carries the fields indexed for filtering at query time:
+ - filename:  base name of the file
+ - file_type: extension without the dot (pdf, html, txt)
+ - category:  first sub-directory under the data dir ("general" at the top level)
+ - tags:      document keywords (PDF "Keywords" metadata, HTML <meta name="keywords">)
+              plus every sub-directory name on the path, lowercased and de-duplicated
+ - modified:  file modification time (unix seconds)
 """
-import os, pathlib, hashlib
+import os, re, pathlib, hashlib
 from typing import List, Dict
 import pdfplumber
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 def file_id(path: str) -> str:
     # stable id based on path
@@ -40,6 +48,53 @@ def load_txt(path: str) -> str:
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
+def split_keywords(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="ignore")
+    return [k.strip().lower() for k in re.split(r"[,;]", str(value)) if k.strip()]
+
+def pdf_keywords(path: str) -> List[str]:
+    with pdfplumber.open(path) as pdf:
+        return split_keywords((pdf.metadata or {}).get("Keywords"))
+
+def html_keywords(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        # only parse <meta> tags
+        soup = BeautifulSoup(f.read(), "html.parser", parse_only=SoupStrainer("meta"))
+    keywords = []
+    for m in soup.find_all("meta", attrs={"name": re.compile("^keywords$", re.I)}):
+        keywords.extend(split_keywords(m.get("content")))
+    return keywords
+
+def doc_keywords(path: str) -> List[str]:
+    _, ext = os.path.splitext(path.lower())
+    try:
+        if ext == ".pdf":
+            return pdf_keywords(path)
+        if ext in (".html", ".htm"):
+            return html_keywords(path)
+    except Exception as e:
+        print(f"Failed to read keywords from {path}: {e}")
+    return []
+
+def file_meta(path: str, directory: str) -> Dict:
+    fname = os.path.basename(path)
+    _, ext = os.path.splitext(fname.lower())
+    rel_dir = os.path.relpath(os.path.dirname(path), directory)
+    parts = [] if rel_dir == os.curdir else pathlib.PurePath(rel_dir).parts
+    dirs = [p.lower() for p in parts]
+    # dict.fromkeys keeps first-seen order while dropping repeats
+    tags = list(dict.fromkeys(doc_keywords(path) + dirs))
+    return {
+        "filename": fname,
+        "file_type": ext.lstrip("."),
+        "category": dirs[0] if dirs else "general",
+        "tags": tags,
+        "modified": os.path.getmtime(path),
+    }
+
 def load_directory(directory: str) -> List[Dict]:
     directory = os.path.abspath(directory)
     results = []
@@ -62,5 +117,5 @@ def load_directory(directory: str) -> List[Dict]:
                 continue
             if not text or len(text.strip()) == 0:
                 continue
-            results.append({"id": file_id(path), "path": path, "text": text, "meta": {"filename": fname}})
+            results.append({"id": file_id(path), "path": path, "text": text, "meta": file_meta(path, directory)})
     return results
@@ -0,0 +1,175 @@
+"""
+Near-duplicate chunk suppression with MinHash + LSH:
+ - minhash() fingerprints a chunk from its word 3-gram shingles
+ - DedupIndex buckets signatures by LSH bands; a chunk whose estimated Jaccard
+   similarity to an indexed representative is >= threshold is a near-duplicate
+ - the index (signatures, owning shard and alternate sources) is persisted as JSON
+   at DEDUP_INDEX so later incremental ingests dedup against earlier runs; each entry
+   also keeps a sha1 of the chunk text so unchanged chunks are recognised exactly
+ - `members` maps every duplicate chunk id to its representative (and text hash), so an
+   edited duplicate can be taken out of its old group's alt_sources
+
+Only the representative is embedded and stored; duplicates are recorded in its
+"alt_sources" payload. So that a duplicate filed elsewhere still matches metadata
+filters, the stored point's MERGED_FIELDS hold the union over the whole group as
+arrays (representative's values first), which MatchValue/MatchAny and the KEYWORD
+indexes match element-wise.
+"""
+import os, re, json, random, hashlib
+from typing import List, Dict, Optional
+
+from config import DEDUP_INDEX
+
+MERGED_FIELDS = ("doc_id", "filename", "file_type", "category", "tags")
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+SEED = 1
+_MERSENNE = (1 << 61) - 1
+
+_rng = random.Random(SEED)
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def _hash64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+def minhash(text: str) -> List[int]:
+    hashes = [_hash64(s) for s in shingles(text)]
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMS]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+def source_of(cid: str, payload: Dict) -> Dict:
+    """alt_sources entry for a duplicate chunk: its id, position and filterable metadata."""
+    source = {"id": cid, "chunk_index": payload.get("chunk_index")}
+    source.update({f: payload.get(f) for f in MERGED_FIELDS})
+    return source
+
+def _values(value) -> List:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def label(value) -> str:
+    """Display form of a payload field that may have been merged into an array."""
+    return ", ".join(map(str, _values(value))) or "unknown"
+
+class DedupIndex:
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self.entries: Dict[str, Dict] = {}
+        self.buckets: Dict[str, List[str]] = {}
+        self.members: Dict[str, Dict] = {}
+
+    def _band_keys(self, sig: List[int]):
+        rows = NUM_PERM // BANDS
+        for b in range(BANDS):
+            yield f"{b}:" + ",".join(map(str, sig[b * rows:(b + 1) * rows]))
+
+    def find(self, sig: List[int], exclude: str = None, key=None) -> Optional[str]:
+        """
+        Return the id of the most similar representative above threshold, if any.
+        With `key`, only representatives added with the same key qualify.
+        """
+        best, best_sim = None, self.threshold
+        seen = {exclude}
+        for band in self._band_keys(sig):
+            for cid in self.buckets.get(band, []):
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                if key is not None and self.entries[cid].get("key") != key:
+                    continue
+                sim = similarity(sig, self.entries[cid]["sig"])
+                if sim >= best_sim:
+                    best, best_sim = cid, sim
+        return best
+
+    def add(self, cid: str, sig: List[int], shard: str = None, digest: str = None,
+            meta: Dict = None, key=None):
+        self.entries[cid] = {"sig": sig, "shard": shard, "hash": digest, "sources": [],
+                             "meta": meta or {}, "key": key}
+        for band in self._band_keys(sig):
+            self.buckets.setdefault(band, []).append(cid)
+
+    def remove(self, cid: str) -> Optional[Dict]:
+        """Drop a representative and its bucket keys; returns the removed entry."""
+        entry = self.entries.pop(cid, None)
+        if entry is None:
+            return None
+        for band in self._band_keys(entry["sig"]):
+            bucket = self.buckets.get(band, [])
+            if cid in bucket:
+                bucket.remove(cid)
+            if not bucket:
+                self.buckets.pop(band, None)
+        return entry
+
+    def add_source(self, cid: str, source: Dict) -> List[Dict]:
+        sources = self.entries[cid]["sources"]
+        if source.get("id") is not None:
+            # replace an older record of the same chunk
+            sources[:] = [s for s in sources if s.get("id") != source["id"]]
+        if source not in sources:
+            sources.append(source)
+        return sources
+
+    def add_member(self, rep: str, source: Dict, digest: str = None):
+        """Record duplicate `source` (with its text hash) in `rep`'s group."""
+        self.add_source(rep, source)
+        if source.get("id") is not None:
+            self.members[source["id"]] = {"rep": rep, "hash": digest}
+
+    def remove_member(self, cid: str) -> Optional[str]:
+        """Take duplicate `cid` out of its group; returns the representative it left."""
+        member = self.members.pop(cid, None)
+        if member is None:
+            return None
+        entry = self.entries.get(member["rep"])
+        if entry is not None:
+            entry["sources"][:] = [s for s in entry["sources"] if s.get("id") != cid]
+        return member["rep"]
+
+    def group_fields(self, cid: str) -> Dict[str, List]:
+        """MERGED_FIELDS as arrays over the representative and all its duplicates."""
+        entry = self.entries[cid]
+        records = [entry.get("meta", {})] + entry["sources"]
+        # dict.fromkeys keeps first-seen order (representative first) while dropping repeats
+        return {f: list(dict.fromkeys(v for r in records for v in _values(r.get(f))))
+                for f in MERGED_FIELDS}
+
+    def save(self, path: str = DEDUP_INDEX):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"num_perm": NUM_PERM, "bands": BANDS, "seed": SEED,
+                       "threshold": self.threshold, "entries": self.entries,
+                       "members": self.members}, f)
+
+    @classmethod
+    def load(cls, path: str = DEDUP_INDEX, threshold: float = None) -> "DedupIndex":
+        """Load a persisted index; `threshold` defaults to the one it was saved with."""
+        if not os.path.exists(path):
+            return cls(threshold or 0.8)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(threshold or data.get("threshold", 0.8))
+        if (data.get("num_perm"), data.get("bands"), data.get("seed")) != (NUM_PERM, BANDS, SEED):
+            print(f"Ignoring dedup index at {path}: built with different MinHash parameters")
+            return index
+        for cid, entry in data.get("entries", {}).items():
+            index.add(cid, entry["sig"], entry.get("shard"), entry.get("hash"),
+                      entry.get("meta"), entry.get("key"))
+            index.entries[cid]["sources"] = entry.get("sources", [])
+        index.members = data.get("members", {})
+        return index
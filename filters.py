@@ -0,0 +1,47 @@
+"""
+Metadata filters pushed down to Qdrant:
+ - PAYLOAD_INDEXES lists the payload fields indexed at ingest and their schema
+ - build_filter turns a simple filter expression into a Qdrant Filter
+
+Filter expressions are plain dicts keyed by payload field:
+ - scalar value      -> exact match        {"category": "devops"}
+ - list of values    -> match any          {"file_type": ["pdf", "html"]}
+ - dict of operators -> range (gt/gte/lt/lte) {"modified": {"gte": 1700000000}}
+A ready-made qmodels.Filter is passed through unchanged.
+"""
+from typing import Optional, Union, Dict, Any
+from qdrant_client.http import models as qmodels
+
+PAYLOAD_INDEXES = {
+    "filename": qmodels.PayloadSchemaType.KEYWORD,
+    "file_type": qmodels.PayloadSchemaType.KEYWORD,
+    "category": qmodels.PayloadSchemaType.KEYWORD,
+    "tags": qmodels.PayloadSchemaType.KEYWORD,
+    "modified": qmodels.PayloadSchemaType.FLOAT,
+}
+
+RANGE_OPS = ("gt", "gte", "lt", "lte")
+
+FilterExpr = Union[qmodels.Filter, Dict[str, Any], None]
+
+def field_condition(key: str, value) -> qmodels.FieldCondition:
+    if isinstance(value, dict):
+        unknown = set(value) - set(RANGE_OPS)
+        if unknown:
+            raise ValueError(f"Unsupported range operator(s) for '{key}': {sorted(unknown)}")
+        return qmodels.FieldCondition(key=key, range=qmodels.Range(**value))
+    if isinstance(value, (list, tuple, set)):
+        return qmodels.FieldCondition(key=key, match=qmodels.MatchAny(any=list(value)))
+    return qmodels.FieldCondition(key=key, match=qmodels.MatchValue(value=value))
+
+def build_filter(expr: FilterExpr) -> Optional[qmodels.Filter]:
+    """
+    Convert a filter expression into a Qdrant Filter (all conditions must hold).
+    Returns None for an empty expression so callers can pass it straight through.
+    """
+    if expr is None or isinstance(expr, qmodels.Filter):
+        return expr
+    conditions = [field_condition(k, v) for k, v in expr.items() if v is not None]
+    if not conditions:
+        return None
+    return qmodels.Filter(must=conditions)
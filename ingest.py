@@ -4,21 +4,34 @@ Ingest pipeline:
  - Chunk text into overlapping chunks
  - Batch-embed chunks via Ollama embedding endpoint
  - Upsert to Qdrant with chunk-level payloads (doc_id, filename, chunk_index, text)
+   plus the document metadata (file_type, category, tags, modified)
+ - Create payload indexes on the metadata fields so retrieval filters run server-side
+ - Route each chunk to a shard (collection/endpoint) by QDRANT_SHARD_KEY, see shards.py
+ - Write an ingest manifest (embedding model, chunking params, documents) used by snapshot.py
+ - Suppress near-duplicate chunks with MinHash LSH (dedup.py): only one representative is
+   embedded and stored, the other copies are listed in its "alt_sources" payload
+ - --append keeps existing collections and dedups against the persisted LSH index
 """
-import os, math, requests, argparse, time
+import os, math, requests, argparse, time, json
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance, PointStruct
+from qdrant_client.http.models import VectorParams, Distance, PointStruct, PointIdsList
 from dotenv import load_dotenv
 from data_loader import load_directory
+from filters import PAYLOAD_INDEXES
+from shards import SHARDS, SHARD_KEY, get_client, shard_for, count_points
+from dedup import DedupIndex, DEDUP_INDEX, MERGED_FIELDS, minhash, content_hash, source_of
+import model_manager
+from config import EMBED_MODEL
 import uuid
 import pdb;
 load_dotenv()
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/embed")
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "nomic-embed-text")
+OLLAMA_MODEL = EMBED_MODEL
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "my_docs")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+INGEST_MANIFEST = os.getenv("INGEST_MANIFEST", "ingest_manifest.json")
 
 def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200):
     """
@@ -40,77 +53,241 @@ def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200):
 
 def embed_texts(texts):
     payload = {"model": OLLAMA_MODEL, "input": texts}
-    r = requests.post(OLLAMA_URL, json=payload, timeout=60)
-    r.raise_for_status()
-    resp = r.json()
+    resp = model_manager.request(OLLAMA_URL, payload, timeout=60)
     print("debug")
     # pdb.set_trace()
     if isinstance(resp, dict) and "embeddings" in resp:
         return resp["embeddings"]
     return resp
 
-def ensure_collection(client: QdrantClient, dim: int):
+def ensure_collection(client: QdrantClient, dim: int, collection_name: str = COLLECTION_NAME):
     try:
         client.recreate_collection(
-            collection_name=COLLECTION_NAME,
+            collection_name=collection_name,
             vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
         )
     except Exception:
         client.create_collection(
-            collection_name=COLLECTION_NAME,
+            collection_name=collection_name,
             vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
         )
+    ensure_payload_indexes(client, collection_name)
 
-def main(data_dir: str, batch_size: int = 16, chunk_size: int = 800, overlap: int = 200):
-    client = QdrantClient(
-    url=QDRANT_URL, 
-    api_key=QDRANT_API_KEY,
-    )
+def ensure_payload_indexes(client: QdrantClient, collection_name: str = COLLECTION_NAME):
+    # index metadata fields so filtered searches don't scan every payload
+    for field, schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=schema,
+        )
+
+def build_manifest(docs, dim: int, chunk_size: int, overlap: int, n_chunks: int) -> dict:
+    return {
+        "embed_model": OLLAMA_MODEL,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "dim": dim,
+        "chunks": n_chunks,
+        "documents": {
+            d["id"]: {"path": d["path"], "filename": d["meta"].get("filename"), "modified": d["meta"].get("modified")}
+            for d in docs
+        },
+        "created": time.time(),
+    }
+
+def write_manifest(manifest: dict, path: str = INGEST_MANIFEST):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+def read_manifest(path: str = INGEST_MANIFEST) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def ensure_collection_exists(client: QdrantClient, dim: int, collection_name: str = COLLECTION_NAME):
+    if not client.collection_exists(collection_name):
+        ensure_collection(client, dim, collection_name)
+        return
+    # collections built before the metadata indexes existed get them on the next append
+    ensure_payload_indexes(client, collection_name)
+
+def dedup_items(items, index: DedupIndex):
+    """
+    Drop near-duplicate and unchanged chunks, recording each near-duplicate as an
+    alternate source of its representative. Unless the shard key is itself a merged
+    field, chunks only group with representatives that share their shard-key value.
+    Returns (kept_items, ids of representatives from earlier runs whose group changed,
+    ids of stored points to delete because their chunk changed and now belongs to
+    another representative's group).
+    """
+    kept, kept_ids, updated, removed = [], set(), set(), []
+    for it in items:
+        p = it["payload"]
+        digest = content_hash(p["text"])
+        old = index.entries.get(it["id"])
+        member = index.members.get(it["id"])
+        if old is not None and old.get("hash") == digest:
+            # unchanged chunk already stored by an earlier run
+            continue
+        if member is not None and member.get("hash") == digest and member["rep"] in index.entries:
+            # unchanged duplicate, already recorded in its group
+            continue
+        if member is not None:
+            # edited duplicate: leave the old group, then match again below
+            left = index.remove_member(it["id"])
+            if left in index.entries and left not in kept_ids:
+                updated.add(left)
+        sig = minhash(p["text"])
+        key = None if SHARD_KEY in MERGED_FIELDS else p.get(SHARD_KEY)
+        rep = index.find(sig, exclude=it["id"], key=key)
+        if old is not None:
+            # changed since the last run: drop the stale signature and bucket keys
+            index.remove(it["id"])
+        if rep is None:
+            index.add(it["id"], sig, shard_for(p)["name"], digest,
+                      meta={f: p.get(f) for f in MERGED_FIELDS}, key=key)
+            if old is not None:
+                index.entries[it["id"]]["sources"] = old["sources"]
+            kept.append(it)
+            kept_ids.add(it["id"])
+            continue
+        index.add_member(rep, source_of(it["id"], p), digest)
+        if old is not None:
+            # a former representative joined another group: its point goes, its copies move over
+            removed.append((it["id"], old["shard"]))
+            for source in old["sources"]:
+                index.add_member(rep, source, index.members.get(source.get("id"), {}).get("hash"))
+        if rep not in kept_ids:
+            updated.add(rep)
+    return kept, updated, removed
+
+def update_alt_sources(index: DedupIndex, rep_ids):
+    shards = {s["name"]: s for s in SHARDS}
+    for rep in rep_ids:
+        if rep not in index.entries:
+            continue
+        shard = shards.get(index.entries[rep]["shard"])
+        if shard is None:
+            continue
+        get_client(shard["url"]).set_payload(
+            collection_name=shard["collection"],
+            payload={"alt_sources": index.entries[rep]["sources"], **index.group_fields(rep)},
+            points=[rep],
+        )
+
+def delete_points(removed):
+    shards = {s["name"]: s for s in SHARDS}
+    by_shard = {}
+    for cid, shard_name in removed:
+        if shard_name in shards:
+            by_shard.setdefault(shard_name, []).append(cid)
+    for shard_name, ids in by_shard.items():
+        shard = shards[shard_name]
+        get_client(shard["url"]).delete(
+            collection_name=shard["collection"],
+            points_selector=PointIdsList(points=ids),
+        )
+
+def main(data_dir: str, batch_size: int = 16, chunk_size: int = 800, overlap: int = 200,
+         dedup: bool = True, dedup_threshold: float = 0.8, append: bool = False):
     abs_path = os.path.join(os.path.dirname(__file__), data_dir)
     docs = load_directory(abs_path)
     print(f"Loaded {len(docs)} documents from {data_dir}")
 
+    previous = read_manifest() if append else {}
+    if previous and (previous.get("embed_model"), previous.get("chunk_size"), previous.get("overlap")) != (OLLAMA_MODEL, chunk_size, overlap):
+        raise ValueError("Cannot --append: existing index was built with a different embedding model or chunking params")
+
     # prepare chunks
-    points = []
     items = []
     for doc in docs:
         chunks = chunk_text(doc["text"], chunk_size=chunk_size, overlap=overlap)
         for i, (chunk, start) in enumerate(chunks):
             cid = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{doc['id']}_{i}"))
-            items.append({"id": cid, "doc_id": doc["id"], "filename": doc["meta"].get("filename"), "text": chunk, "chunk_index": i})
+            payload = {
+                "doc_id": doc["id"],
+                "text": chunk,
+                "chunk_index": i,
+                **doc["meta"],
+            }
+            items.append({"id": cid, "payload": payload})
 
     print(f"Total chunks: {len(items)}")
     if len(items) == 0:
         return
 
+    index, updated, removed = None, set(), []
+    if dedup:
+        index = DedupIndex.load(threshold=dedup_threshold) if append else DedupIndex(dedup_threshold)
+        total = len(items)
+        items, updated, removed = dedup_items(items, index)
+        print(f"Dedup: keeping {len(items)} of {total} chunks ({total - len(items)} near-duplicates or unchanged)")
+    elif not append and os.path.exists(DEDUP_INDEX):
+        # collections are recreated below, so the persisted index no longer matches them
+        os.remove(DEDUP_INDEX)
+
+    if items:
+        # load the embedding model up front instead of on the first batch
+        try:
+            model_manager.warm(OLLAMA_MODEL, "embed")
+        except Exception as e:
+            print(f"Failed to preload {OLLAMA_MODEL}: {e}")
+
     # Batch embed & upsert
     # embed in batches to avoid giant requests
+    dim = previous.get("dim")
     for i in range(0, len(items), batch_size):
         batch = items[i:i+batch_size]
-        texts = [it["text"] for it in batch]
+        texts = [it["payload"]["text"] for it in batch]
         embeddings = embed_texts(texts)
         dim = len(embeddings[0])
-        # ensure collection once (on first batch)
+        # ensure every shard's collection once (on first batch)
         if i == 0:
-            ensure_collection(client, dim)
-        points = []
+            for shard in SHARDS:
+                prepare = ensure_collection_exists if append else ensure_collection
+                prepare(get_client(shard["url"]), dim, shard["collection"])
+        by_shard = {}
         for it, emb in zip(batch, embeddings):
-            payload = {
-                "doc_id": it["doc_id"],
-                "filename": it["filename"],
-                "text": it["text"],
-                "chunk_index": it["chunk_index"],
-            }
-            points.append(PointStruct(id=it["id"], vector=emb, payload=payload))
-        client.upsert(collection_name=COLLECTION_NAME, points=points)
-        print(f"Upserted batch {i // batch_size + 1} ({len(points)} points)")
+            payload = it["payload"]
+            shard = shard_for(payload)
+            if index is not None:
+                # filterable metadata of the whole near-duplicate group
+                payload.update(index.group_fields(it["id"]))
+                if index.entries[it["id"]]["sources"]:
+                    payload["alt_sources"] = index.entries[it["id"]]["sources"]
+            by_shard.setdefault(shard["name"], (shard, []))[1].append(PointStruct(id=it["id"], vector=emb, payload=payload))
+        for shard, points in by_shard.values():
+            get_client(shard["url"]).upsert(collection_name=shard["collection"], points=points)
+        print(f"Upserted batch {i // batch_size + 1} ({len(batch)} points across {len(by_shard)} shard(s))")
         time.sleep(0.1)
 
+    if index is not None:
+        update_alt_sources(index, updated)
+        delete_points(removed)
+        if removed:
+            print(f"Deleted {len(removed)} former representatives that became near-duplicates")
+        index.save()
+        print(f"Saved dedup index to {DEDUP_INDEX} ({len(index.entries)} representatives)")
+
+    # count what is actually stored: on --append, re-embedded chunks replace existing points
+    stored = sum(count_points(shard) for shard in SHARDS)
+    manifest = build_manifest(docs, dim, chunk_size, overlap, stored)
+    if previous:
+        manifest["documents"] = {**previous.get("documents", {}), **manifest["documents"]}
+    write_manifest(manifest)
+    print(f"Wrote ingest manifest to {INGEST_MANIFEST}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--data-dir", default="test_data", help="Directory containing pdf/html/txt files")
     parser.add_argument("--batch-size", type=int, default=16)
     parser.add_argument("--chunk-size", type=int, default=800)
     parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--no-dedup", action="store_true", help="Embed every chunk, including near-duplicates")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8, help="Estimated Jaccard similarity above which chunks are duplicates")
+    parser.add_argument("--append", action="store_true", help="Keep existing collections and dedup against the persisted index")
     args = parser.parse_args()
-    main(args.data_dir, args.batch_size, args.chunk_size, args.overlap)
+    main(args.data_dir, args.batch_size, args.chunk_size, args.overlap,
+         dedup=not args.no_dedup, dedup_threshold=args.dedup_threshold, append=args.append)
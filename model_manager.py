@@ -0,0 +1,99 @@
+"""
+Ollama model lifecycle:
+ - every embed/chat request goes through request(), which adds keep_alive
+   (OLLAMA_KEEP_ALIVE, default 30m) so models stay resident between calls
+ - start() preloads the embed and chat models and runs a background thread that
+   pings any model idle for longer than OLLAMA_WARMUP_INTERVAL seconds
+ - load_duration reported by Ollama is recorded per model; a request that paid more
+   than OLLAMA_COLD_LOAD_MS to load the model counts as a cold hit, see metrics();
+   the manager's own preloads and pings are counted separately as warm-ups
+"""
+import time, threading
+from typing import Dict, Optional
+import requests
+from config import OLLAMA_BASE_URL, EMBED_MODEL, LLM_MODEL, KEEP_ALIVE, WARMUP_INTERVAL, COLD_LOAD_MS
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict] = {}
+_kinds: Dict[str, str] = {EMBED_MODEL: "embed", LLM_MODEL: "chat"}
+_pinger: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+def _record(model: str, data: dict, warmup: bool = False):
+    load_ms = (data.get("load_duration") or 0) / 1e6 if isinstance(data, dict) else 0.0
+    with _lock:
+        s = _stats.setdefault(model, {"requests": 0, "cold_hits": 0, "total_load_ms": 0.0, "max_load_ms": 0.0, "last_used": 0.0,
+                                      "warmups": 0, "warmup_load_ms": 0.0})
+        if warmup:
+            # keep preloads/pings out of the user-facing numbers (and out of last_used,
+            # so an idle model keeps getting pinged)
+            s["warmups"] += 1
+            s["warmup_load_ms"] += load_ms
+            return
+        s["requests"] += 1
+        s["total_load_ms"] += load_ms
+        s["max_load_ms"] = max(s["max_load_ms"], load_ms)
+        if load_ms > COLD_LOAD_MS:
+            s["cold_hits"] += 1
+        s["last_used"] = time.time()
+
+def request(url: str, payload: dict, timeout: float = 60, warmup: bool = False) -> dict:
+    """POST an Ollama request with keep_alive set and record its model load time."""
+    payload = {"keep_alive": KEEP_ALIVE, **payload}
+    r = requests.post(url, json=payload, timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    _record(payload.get("model"), data, warmup)
+    return data
+
+def warm(model: str, kind: str = None, timeout: float = 120) -> dict:
+    """Load `model` (or refresh its keep-alive) without generating anything."""
+    kind = kind or _kinds.get(model, "chat")
+    if kind == "embed":
+        return request(f"{OLLAMA_BASE_URL}/api/embed", {"model": model, "input": "warm-up"}, timeout, warmup=True)
+    # an empty prompt makes Ollama load the model and return immediately
+    return request(f"{OLLAMA_BASE_URL}/api/generate", {"model": model}, timeout, warmup=True)
+
+def _ping_idle():
+    while not _stop.wait(WARMUP_INTERVAL):
+        now = time.time()
+        for model, kind in list(_kinds.items()):
+            with _lock:
+                last = _stats.get(model, {}).get("last_used", 0.0)
+            if now - last < WARMUP_INTERVAL:
+                continue
+            try:
+                warm(model, kind)
+            except Exception as e:
+                print(f"Warm-up ping for {model} failed: {e}")
+
+def start(models: Dict[str, str] = None, ping: bool = True):
+    """
+    Preload models ({name: "embed" | "chat"}, default: embed + chat model) and,
+    if `ping`, start the idle warm-up thread. Safe to call more than once.
+    """
+    global _pinger
+    if models:
+        _kinds.update(models)
+    for model, kind in list(_kinds.items()):
+        start_t = time.perf_counter()
+        try:
+            warm(model, kind)
+            print(f"Preloaded {model} ({kind}) in {(time.perf_counter() - start_t) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"Failed to preload {model}: {e}")
+    if ping and WARMUP_INTERVAL > 0 and (_pinger is None or not _pinger.is_alive()):
+        _stop.clear()
+        _pinger = threading.Thread(target=_ping_idle, name="ollama-warmup", daemon=True)
+        _pinger.start()
+
+def stop():
+    _stop.set()
+
+def metrics() -> Dict[str, Dict]:
+    """Per-model request count, cold hits and load times (ms) for real calls, plus warm-up counts."""
+    with _lock:
+        out = {}
+        for model, s in _stats.items():
+            out[model] = {**s, "avg_load_ms": s["total_load_ms"] / s["requests"] if s["requests"] else 0.0}
+        return out
@@ -6,12 +6,16 @@ from sklearn.metrics.pairwise import cosine_similarity
 from qdrant_client.models import NamedVector
 from qdrant_client.models import Query
 import numpy as np
+from filters import build_filter
+from shards import search_shards, shards_for_filter, report_latencies
+from dedup import label
+import model_manager
 
 # --- Configuration ---
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "my_docs")
-OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+OLLAMA_EMBED_MODEL = model_manager.EMBED_MODEL
 
 # --- Connect to Qdrant ---
 client = QdrantClient(
@@ -22,18 +26,17 @@ client = QdrantClient(
 
 # --- Embedding helper ---
 def embed_text(text):
-    payload = {"model": "nomic-embed-text", "input": text}
-    r = requests.post("http://localhost:11434/api/embed", json=payload)
-    r.raise_for_status()
-    data = r.json()
+    payload = {"model": OLLAMA_EMBED_MODEL, "input": text}
+    data = model_manager.request(f"{model_manager.OLLAMA_BASE_URL}/api/embed", payload)
     embedding = data.get("embeddings", [])
     return np.array(embedding, dtype=np.float32)
 
 
 # --- Semantic Search ---
-def search(query, top_k=5, rerank=False, min_relevance=0.5):
+def search(query, top_k=5, rerank=False, min_relevance=0.5, filters=None):
     """
     Semantic search with intelligent thresholding to ignore irrelevant results.
+    `filters` is a metadata filter expression (see filters.build_filter) applied inside Qdrant.
     """
     query_vector = embed_text(query)
 
@@ -42,15 +45,15 @@ def search(query, top_k=5, rerank=False, min_relevance=0.5):
         query_vector = query_vector[0]
     vector_data = query_vector.tolist() if hasattr(query_vector, "tolist") else query_vector
 
-    # Query Qdrant
-    response = client.query_points(
-        collection_name=COLLECTION_NAME,
-        query=vector_data,
+    # Query Qdrant (all relevant shards in parallel, merged into a global top-k)
+    results, latencies = search_shards(
+        vector_data,
         limit=top_k * 2 if rerank else top_k,
-        with_payload=True
+        query_filter=build_filter(filters),
+        shards=shards_for_filter(filters),
     )
+    report_latencies(latencies)
 
-    results = response.points
     if not results:
         print("⚠️ No results found in Qdrant.")
         return []
@@ -58,7 +61,7 @@ def search(query, top_k=5, rerank=False, min_relevance=0.5):
     # Inspect scores
     print("\n🔍 Raw scores:")
     for r in results:
-        print(f"{r.payload.get('filename', 'N/A')} → {r.score:.4f}")
+        print(f"{label(r.payload.get('filename'))} → {r.score:.4f}")
 
     # --- Intelligent filtering ---
     # Get highest score
@@ -138,8 +141,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--query", type=str, required=True)
     parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--category", help="Only search documents in this category")
+    parser.add_argument("--file-type", help="Only search this file type (pdf, html, txt)")
+    parser.add_argument("--tag", action="append", help="Only search documents with any of these tags")
     args = parser.parse_args()
 
-    hits = semantic_search(args.query, top_k=args.top_k)
+    filters = {"category": args.category, "file_type": args.file_type, "tags": args.tag}
+    hits = semantic_search(args.query, top_k=args.top_k, filters=filters)
     for r in hits:
-        print(r.payload["filename"], ":", r.payload["text"][:150])
+        print(label(r.payload.get("filename")), ":", r.payload["text"][:150])
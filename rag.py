@@ -7,14 +7,19 @@ from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
 import numpy as np
 
+from filters import build_filter, FilterExpr
+from shards import search_shards, shards_for_filter, report_latencies
+from dedup import label
+import model_manager
+
 
 QDRANT_URL = os.getenv("QDRANT_URL", "")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY","")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "my_docs")
 
-OLLAMA_BASE_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
-EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
-LLM_MODEL = os.getenv("OLLAMA_LLM_MODEL", "llama3")
+OLLAMA_BASE_URL = model_manager.OLLAMA_BASE_URL
+EMBED_MODEL = model_manager.EMBED_MODEL
+LLM_MODEL = model_manager.LLM_MODEL
 
 
 print(QDRANT_URL)
@@ -25,11 +30,19 @@ qdrant = QdrantClient(
 
 
 
+# Kept byte-identical across calls so Ollama can reuse the cached prompt prefix;
+# everything that varies per request (context, question) goes after it.
+SYSTEM_PROMPT = "You are a factual assistant. Use only the provided context."
+PROMPT_PREFIX = """You are a helpful assistant that answers questions using ONLY the provided context.
+If the answer is not in the context, say that you do not know and do NOT hallucinate.
+
+Context:
+"""
+
+
 def embed_text(text):
-    payload = {"model": "nomic-embed-text", "input": text}
-    r = requests.post("http://localhost:11434/api/embed", json=payload, timeout=60)
-    r.raise_for_status()
-    resp = r.json()
+    payload = {"model": EMBED_MODEL, "input": text}
+    resp = model_manager.request(f"{OLLAMA_BASE_URL}/api/embed", payload, timeout=60)
     print("debug")
     # pdb.set_trace()
     if isinstance(resp, dict) and "embeddings" in resp:
@@ -38,9 +51,11 @@ def embed_text(text):
 
 
 
-def retrieve_context(question: str, top_k: int = 5) -> List[qmodels.ScoredPoint]:
+def retrieve_context(question: str, top_k: int = 5, filters: FilterExpr = None) -> List[qmodels.ScoredPoint]:
     """
     Semantic search in Qdrant to retrieve top_k relevant chunks.
+    Fans out to every relevant shard concurrently and merges into a global top_k.
+    `filters` (see filters.build_filter) restricts the search to matching payloads server-side.
     """
     query_vector = embed_text(question)
 
@@ -48,14 +63,15 @@ def retrieve_context(question: str, top_k: int = 5) -> List[qmodels.ScoredPoint]
         query_vector = query_vector[0]
     vector_data = query_vector.tolist() if hasattr(query_vector, "tolist") else query_vector
 
-    res = qdrant.query_points(
-        collection_name=COLLECTION_NAME,
-        query=vector_data,
-        limit=5,
-        with_payload=True
+    points, latencies = search_shards(
+        vector_data,
+        limit=top_k,
+        query_filter=build_filter(filters),
+        shards=shards_for_filter(filters),
     )
+    report_latencies(latencies)
 
-    return res.points
+    return points
 
 
 def build_prompt(question: str, contexts: List[qmodels.ScoredPoint]) -> str:
@@ -66,7 +82,7 @@ def build_prompt(question: str, contexts: List[qmodels.ScoredPoint]) -> str:
     print("Debug prompts")
     for i, pt in enumerate(contexts, start=1):
         payload = pt.payload or {}
-        filename = payload.get("filename", "unknown")
+        filename = label(payload.get("filename"))
         text = payload.get("text", "")
         context_blocks.append(
             f"[Document {i} | {filename} | score={pt.score:.3f}]\n{text}"
@@ -74,18 +90,12 @@ def build_prompt(question: str, contexts: List[qmodels.ScoredPoint]) -> str:
     
     context_str = "\n\n".join(context_blocks)
 
-    prompt = f"""
-You are a helpful assistant that answers questions using ONLY the provided context.
-If the answer is not in the context, say that you do not know and do NOT hallucinate.
-
-Context:
-{context_str}
+    prompt = PROMPT_PREFIX + f"""{context_str}
 
 Question:
 {question}
 
-Answer clearly and concisely:
-""".strip()
+Answer clearly and concisely:"""
 
     return prompt
 
@@ -95,20 +105,18 @@ def call_llm(prompt: str) -> str:
     Call Llama3 via Ollama's /api/chat endpoint.
     """
     print("Debug")
-    resp = requests.post(
+    data = model_manager.request(
         f"{OLLAMA_BASE_URL}/api/chat",
-        json={
+        {
             "model": LLM_MODEL,
             "messages": [
-                {"role": "system", "content": "You are a factual assistant. Use only the provided context."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             "stream": False
         },
         timeout=120
     )
-    resp.raise_for_status()
-    data = resp.json()
 
     if "message" in data and "content" in data["message"]:
         return data["message"]["content"].strip()
@@ -116,7 +124,7 @@ def call_llm(prompt: str) -> str:
     return str(data)
 
 
-def answer_question(question: str, top_k: int = 5, show_sources: bool = True) -> dict:
+def answer_question(question: str, top_k: int = 5, show_sources: bool = True, filters: FilterExpr = None) -> dict:
     """
     Full RAG pipeline:
       1. Embed question
@@ -125,7 +133,7 @@ def answer_question(question: str, top_k: int = 5, show_sources: bool = True) ->
       4. Call Llama3
       5. Return answer + sources
     """
-    points = retrieve_context(question, top_k=top_k)
+    points = retrieve_context(question, top_k=top_k, filters=filters)
     if not points:
         return {
             "answer": "I could not find any relevant information in the knowledge base.",
@@ -140,7 +148,8 @@ def answer_question(question: str, top_k: int = 5, show_sources: bool = True) ->
             {
                 "id": p.id,
                 "score": p.score,
-                "filename": (p.payload or {}).get("filename"),
+                "filename": label((p.payload or {}).get("filename")),
+                "alt_sources": (p.payload or {}).get("alt_sources", []),
                 "snippet": textwrap.shorten((p.payload or {}).get("text", ""), width=200, placeholder="...")
             }
             for p in points
@@ -158,6 +167,7 @@ if __name__ == "__main__":
     import sys
 
     q = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else "How do I configure IIS on Windows?"
+    model_manager.start(ping=False)
     result = answer_question(q, top_k=5, show_sources=True)
 
     print("\n🧠 Answer:\n")
@@ -166,3 +176,5 @@ if __name__ == "__main__":
     for src in result["sources"]:
         print(f"- {src['filename']} (score={src['score']:.3f})")
         print(f"  {src['snippet']}\n")
+
+    print("📈 Model metrics:", model_manager.metrics())
@@ -0,0 +1,147 @@
+"""
+Sharded collections:
+ - QDRANT_SHARDS lists the shards as comma-separated "collection" or "collection@url"
+   entries (default: a single shard, QDRANT_COLLECTION on QDRANT_URL)
+ - QDRANT_SHARD_KEY names the payload field used for routing (default: doc_id);
+   a point goes to shard sha1(value) % number_of_shards (first element for fields
+   that dedup merged into arrays, i.e. the representative's own value)
+ - search_shards fans a query out to the relevant shards concurrently and
+   merges the per-shard top-k into a global top-k, timing each shard; shards that
+   fail or exceed QDRANT_SHARD_TIMEOUT seconds are skipped and reported
+"""
+import hashlib, time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import List, Dict, Tuple, Optional
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+from dedup import MERGED_FIELDS
+from config import QDRANT_URL, QDRANT_API_KEY, COLLECTION_NAME, QDRANT_SHARDS, SHARD_KEY, SHARD_TIMEOUT
+
+def parse_shards(spec: Optional[str]) -> List[Dict]:
+    if not spec:
+        return [{"name": COLLECTION_NAME, "collection": COLLECTION_NAME, "url": QDRANT_URL}]
+    shards = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        collection, _, url = entry.partition("@")
+        shards.append({"name": entry, "collection": collection, "url": url or QDRANT_URL})
+    return shards
+
+SHARDS = parse_shards(QDRANT_SHARDS)
+
+_clients: Dict[str, QdrantClient] = {}
+
+def get_client(url: str) -> QdrantClient:
+    # one client per endpoint, shared by every shard that lives there
+    if url not in _clients:
+        _clients[url] = QdrantClient(url=url, api_key=QDRANT_API_KEY)
+    return _clients[url]
+
+def shard_index(value, n_shards: int = None) -> int:
+    n_shards = n_shards or len(SHARDS)
+    digest = hashlib.sha1(str(value).encode("utf-8")).hexdigest()
+    return int(digest, 16) % n_shards
+
+def shard_for(payload: Dict) -> Dict:
+    """Return the shard a chunk payload is routed to."""
+    if payload.get(SHARD_KEY) is None:
+        raise ValueError(f"Chunk payload has no '{SHARD_KEY}' field to route by (QDRANT_SHARD_KEY); "
+                         f"available fields: {sorted(payload)}")
+    value = payload[SHARD_KEY]
+    if isinstance(value, list):
+        value = value[0]
+    return SHARDS[shard_index(value)]
+
+def shards_for_filter(filters=None) -> List[Dict]:
+    """
+    Shards that can hold matches for a filter expression. An exact match on the
+    shard key pins the query to the owning shard(s); anything else hits them all.
+    Keys that dedup merges across a group (e.g. doc_id) never pin: a duplicate's
+    value lives on its representative's shard, not its own.
+    """
+    if SHARD_KEY in MERGED_FIELDS or not isinstance(filters, dict) or filters.get(SHARD_KEY) is None:
+        return SHARDS
+    value = filters[SHARD_KEY]
+    if isinstance(value, dict):
+        return SHARDS
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    wanted = {shard_index(v) for v in values}
+    return [s for i, s in enumerate(SHARDS) if i in wanted]
+
+def _query_shard(shard: Dict, vector, limit: int, query_filter, timeout: float) -> List[qmodels.ScoredPoint]:
+    res = get_client(shard["url"]).query_points(
+        collection_name=shard["collection"],
+        query=vector,
+        query_filter=query_filter,
+        limit=limit,
+        with_payload=True,
+        timeout=max(1, int(timeout))
+    )
+    return res.points
+
+def search_shards(vector, limit: int, query_filter=None, shards: List[Dict] = None,
+                  timeout: float = SHARD_TIMEOUT) -> Tuple[List[qmodels.ScoredPoint], Dict[str, Dict]]:
+    """
+    Query every shard concurrently for `limit` hits and merge into a global top `limit`.
+    A shard that errors or doesn't answer within `timeout` seconds is left out of the merge.
+    Returns (points, {shard_name: {"ms": latency_ms, "status": "ok" | "timeout" | "error: ..."}}).
+    """
+    shards = shards if shards is not None else SHARDS
+    if not shards:
+        return [], {}
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=len(shards))
+    futures = {pool.submit(_query_shard, s, vector, limit, query_filter, timeout): s["name"] for s in shards}
+    merged, latencies = [], {}
+    try:
+        for fut in as_completed(futures, timeout=timeout):
+            name = futures[fut]
+            ms = (time.perf_counter() - start) * 1000
+            try:
+                merged.extend(fut.result())
+                latencies[name] = {"ms": ms, "status": "ok"}
+            except Exception as e:
+                latencies[name] = {"ms": ms, "status": f"error: {e}"}
+    except FuturesTimeout:
+        pass
+    finally:
+        # don't block on hung shards; their threads finish (or time out client-side) on their own
+        pool.shutdown(wait=False, cancel_futures=True)
+    for name in futures.values():
+        if name not in latencies:
+            latencies[name] = {"ms": timeout * 1000, "status": "timeout"}
+
+    merged.sort(key=lambda p: p.score, reverse=True)
+    return merged[:limit], latencies
+
+def count_points(shard: Dict) -> int:
+    return get_client(shard["url"]).count(collection_name=shard["collection"], exact=True).count
+
+def scroll_shards(limit: int, scroll_filter=None, shards: List[Dict] = None) -> List:
+    """Scroll up to `limit` points from each shard (payloads only)."""
+    shards = shards if shards is not None else SHARDS
+    points = []
+    for s in shards:
+        pts, _ = get_client(s["url"]).scroll(
+            collection_name=s["collection"],
+            scroll_filter=scroll_filter,
+            limit=limit,
+            with_payload=True
+        )
+        points.extend(pts)
+    return points
+
+def report_latencies(latencies: Dict[str, Dict]):
+    if not latencies:
+        return
+    ok = {name: l["ms"] for name, l in latencies.items() if l["status"] == "ok"}
+    slowest = max(ok, key=ok.get) if len(ok) > 1 else None
+    print("⏱️ Shard latencies:")
+    for name, l in latencies.items():
+        if l["status"] != "ok":
+            print(f"  {name}: {l['ms']:.1f} ms  <- {l['status']} (results missing)")
+            continue
+        flag = "  <- slowest" if name == slowest else ""
+        print(f"  {name}: {l['ms']:.1f} ms{flag}")
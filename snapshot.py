@@ -0,0 +1,209 @@
+"""
+Index snapshots, so a new node can boot without re-parsing and re-embedding:
+ - export: scroll every shard and write a snapshot directory
+     manifest.json  - snapshot format, ingest manifest (embedding model, chunking params, documents), dtype
+     vectors.npy    - [N, dim] float32, or int8 with per-row scales in scales.npy
+     points.jsonl   - one {"id", "payload"} per line, row-aligned with vectors.npy
+     dedup_index.json - the near-duplicate LSH index (dedup.py), when ingest built one
+ - import: validate the manifest against the current embedding model and chunking
+   params and the files against each other, then recreate the shard collections
+   and bulk-upsert with parallel batches
+
+vectors.npy is written and read through memory maps, and import keeps at most
+2 * workers batches in flight, so large snapshots are streamed, not loaded.
+"""
+import os, json, time, argparse, shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from qdrant_client.http.models import PointStruct
+from ingest import ensure_collection, read_manifest, write_manifest
+from config import EMBED_MODEL
+from shards import SHARDS, get_client, shard_for, count_points
+from dedup import DedupIndex, DEDUP_INDEX
+
+SNAPSHOT_FORMAT = 1
+DTYPES = ("float32", "int8")
+
+def iter_shard_points(shard: dict, page_size: int = 1000):
+    client = get_client(shard["url"])
+    offset = None
+    while True:
+        pts, offset = client.scroll(
+            collection_name=shard["collection"],
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        yield from pts
+        if offset is None:
+            break
+
+def quantize(vector: np.ndarray):
+    # symmetric int8 quantization of one row: v ~= q * scale
+    scale = float(np.abs(vector).max()) / 127.0 or 1.0
+    return np.round(vector / scale).astype(np.int8), scale
+
+def export_snapshot(out_dir: str, dtype: str = "float32"):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {DTYPES}")
+    manifest = read_manifest()
+    if not manifest:
+        raise ValueError("No ingest manifest found; run ingest.py before exporting a snapshot")
+    os.makedirs(out_dir, exist_ok=True)
+
+    # rows are streamed straight into memory-mapped .npy files sized from the point counts
+    total = sum(count_points(shard) for shard in SHARDS)
+    if total == 0:
+        raise ValueError("Collections are empty; nothing to export")
+    matrix = np.lib.format.open_memmap(os.path.join(out_dir, "vectors.npy"), mode="w+",
+                                       dtype=np.dtype(dtype), shape=(total, manifest["dim"]))
+    scales = None
+    if dtype == "int8":
+        scales = np.lib.format.open_memmap(os.path.join(out_dir, "scales.npy"), mode="w+",
+                                           dtype=np.float32, shape=(total,))
+
+    row = 0
+    with open(os.path.join(out_dir, "points.jsonl"), "w", encoding="utf-8") as f:
+        for shard in SHARDS:
+            for p in iter_shard_points(shard):
+                if row >= total:
+                    raise ValueError("Collections grew during export; stop ingest and retry")
+                vec = np.asarray(p.vector, dtype=np.float32)
+                if scales is not None:
+                    matrix[row], scales[row] = quantize(vec)
+                else:
+                    matrix[row] = vec
+                f.write(json.dumps({"id": str(p.id), "payload": p.payload}) + "\n")
+                row += 1
+    matrix.flush()
+    if scales is not None:
+        scales.flush()
+    del matrix, scales
+
+    # ship the LSH index so `ingest --append` on the new node keeps deduping against it
+    if os.path.exists(DEDUP_INDEX):
+        shutil.copyfile(DEDUP_INDEX, os.path.join(out_dir, "dedup_index.json"))
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": SNAPSHOT_FORMAT,
+            "dtype": dtype,
+            "count": row,
+            "exported": time.time(),
+            "ingest": manifest,
+        }, f, indent=2)
+    print(f"Exported {row} points ({dtype}) to {out_dir}")
+
+def check_snapshot(snap: dict, chunk_size: int, overlap: int):
+    """Reject snapshots built with a different format, embedding model or chunking."""
+    if snap.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Snapshot format {snap.get('format')} != supported format {SNAPSHOT_FORMAT}")
+    ingest = snap.get("ingest", {})
+    expected = {"embed_model": EMBED_MODEL, "chunk_size": chunk_size, "overlap": overlap}
+    stale = {k: (ingest.get(k), v) for k, v in expected.items() if ingest.get(k) != v}
+    if stale:
+        details = ", ".join(f"{k}: snapshot={a!r} current={b!r}" for k, (a, b) in stale.items())
+        raise ValueError(f"Stale snapshot ({details})")
+
+def check_files(in_dir: str, snap: dict, vectors: np.ndarray, scales) -> int:
+    """
+    Check the snapshot files agree with each other and the manifest before any
+    collection is recreated. Returns the number of points to load.
+    """
+    with open(os.path.join(in_dir, "points.jsonl"), "r", encoding="utf-8") as f:
+        n_points = sum(1 for _ in f)
+    problems = []
+    if n_points != snap.get("count"):
+        problems.append(f"points.jsonl has {n_points} lines, manifest count is {snap.get('count')}")
+    if vectors.ndim != 2 or vectors.shape[0] < n_points:
+        problems.append(f"vectors.npy shape {vectors.shape} has fewer rows than {n_points} points")
+    elif vectors.shape[1] != snap.get("ingest", {}).get("dim"):
+        problems.append(f"vectors.npy dim {vectors.shape[1]} != manifest dim {snap.get('ingest', {}).get('dim')}")
+    if vectors.dtype != np.dtype(snap["dtype"]):
+        problems.append(f"vectors.npy dtype {vectors.dtype} != manifest dtype {snap['dtype']}")
+    if snap["dtype"] == "int8" and (scales is None or scales.shape[0] != vectors.shape[0]):
+        problems.append(f"scales.npy rows {None if scales is None else scales.shape[0]} != vectors.npy rows {vectors.shape[0]}")
+    if problems:
+        raise ValueError("Corrupt or mismatched snapshot: " + "; ".join(problems))
+    return n_points
+
+def import_snapshot(in_dir: str, chunk_size: int = 800, overlap: int = 200, batch_size: int = 512, workers: int = 4):
+    with open(os.path.join(in_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        snap = json.load(f)
+    check_snapshot(snap, chunk_size, overlap)
+
+    vectors = np.load(os.path.join(in_dir, "vectors.npy"), mmap_mode="r")
+    scales_path = os.path.join(in_dir, "scales.npy")
+    scales = np.load(scales_path, mmap_mode="r") if snap["dtype"] == "int8" and os.path.exists(scales_path) else None
+    # validate everything up front: the collections are wiped below
+    check_files(in_dir, snap, vectors, scales)
+    dim = vectors.shape[1]
+
+    dedup_path = os.path.join(in_dir, "dedup_index.json")
+    index = DedupIndex.load(dedup_path) if os.path.exists(dedup_path) else None
+
+    for shard in SHARDS:
+        ensure_collection(get_client(shard["url"]), dim, shard["collection"])
+
+    def upsert(shard, points):
+        get_client(shard["url"]).upsert(collection_name=shard["collection"], points=points, wait=True)
+        return len(points)
+
+    start = time.perf_counter()
+    loaded = 0
+    max_pending = 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            open(os.path.join(in_dir, "points.jsonl"), "r", encoding="utf-8") as f:
+        # bounded so reading the snapshot can't run ahead of the upserts
+        pending = deque()
+        by_shard = {}
+        for row, line in enumerate(f):
+            rec = json.loads(line)
+            vec = vectors[row].astype(np.float32)
+            if scales is not None:
+                vec = vec * scales[row]
+            shard = shard_for(rec["payload"])
+            if index is not None and rec["id"] in index.entries:
+                # shard layout may differ on this node
+                index.entries[rec["id"]]["shard"] = shard["name"]
+            batch = by_shard.setdefault(shard["name"], (shard, []))[1]
+            batch.append(PointStruct(id=rec["id"], vector=vec.tolist(), payload=rec["payload"]))
+            if len(batch) >= batch_size:
+                pending.append(pool.submit(upsert, shard, batch))
+                by_shard[shard["name"]] = (shard, [])
+                while len(pending) > max_pending:
+                    loaded += pending.popleft().result()
+        for shard, batch in by_shard.values():
+            if batch:
+                pending.append(pool.submit(upsert, shard, batch))
+        for fut in pending:
+            loaded += fut.result()
+
+    write_manifest(snap["ingest"])
+    if index is not None:
+        index.save()
+    elif os.path.exists(DEDUP_INDEX):
+        # collections were recreated, so a local index no longer matches them
+        os.remove(DEDUP_INDEX)
+    print(f"Imported {loaded} points from {in_dir} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="Write the current index to a snapshot directory")
+    exp.add_argument("--out", required=True)
+    exp.add_argument("--dtype", choices=DTYPES, default="float32")
+    imp = sub.add_parser("import", help="Bulk-load a snapshot directory into fresh collections")
+    imp.add_argument("--in", dest="in_dir", required=True)
+    imp.add_argument("--chunk-size", type=int, default=800)
+    imp.add_argument("--overlap", type=int, default=200)
+    imp.add_argument("--batch-size", type=int, default=512)
+    imp.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.out, args.dtype)
+    else:
+        import_snapshot(args.in_dir, args.chunk_size, args.overlap, args.batch_size, args.workers)